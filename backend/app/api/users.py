@@ -7,6 +7,7 @@ registration, authentication, and profile management.
 
 from fastapi import APIRouter, Depends, HTTPException, status, Body, Request
 import datetime
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi import UploadFile, File
 import os
@@ -474,7 +475,7 @@ async def submit_user_survey(
         )
 
 
-@router.post("/me/llm-meal-plan", response_model=LLMMealPlanResponse)
+@router.post("/me/llm-meal-plan", response_model=LLMMealPlanResponse, response_class=ORJSONResponse)
 async def generate_llm_meal_plan_endpoint(
     include_recipes: bool = False,
     current_user: models.User = Depends(get_current_active_user),
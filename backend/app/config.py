@@ -85,6 +85,9 @@ class Settings(BaseSettings):
     openai_api_key: Optional[str] = Field(default=None, json_schema_extra={"env": "OPENAI_API_KEY"})
     llm_provider: str = Field(default="anthropic", json_schema_extra={"env": "LLM_PROVIDER"})  # "anthropic" or "openai"
     llm_model: str = Field(default="claude-3-5-haiku-20241022", json_schema_extra={"env": "LLM_MODEL"})
+    # Max number of generated meal plans reused for identical requests (0 disables, so
+    # "Generate New Meal Plan" always gets a fresh plan)
+    llm_response_cache_size: int = Field(default=0, json_schema_extra={"env": "LLM_RESPONSE_CACHE_SIZE"})
 
 
 # Global settings instance
@@ -262,6 +262,60 @@ class IngredientEntity(Entity):
 
         return matching_ingredients
 
+    @classmethod
+    def get_ingredients_by_pillars(
+        cls,
+        db: Session,
+        pillar_ids: List[int],
+        skip: int = 0,
+        limit: int = 100
+    ) -> Dict[int, List['IngredientEntity']]:
+        """
+        Query ingredients for several health pillars in a single round-trip.
+
+        Returns the same ingredients as calling get_ingredients_by_pillar once per
+        pillar with the same skip and limit: the page of rows is fetched once and
+        bucketed per pillar in Python instead of being re-queried for each pillar.
+
+        Args:
+            db: SQLAlchemy database session
+            pillar_ids: Health pillar IDs (1-8)
+            skip: Number of records to skip for pagination (default: 0)
+            limit: Maximum number of records to scan (default: 100)
+
+        Returns:
+            Dict mapping each requested pillar ID to its matching IngredientEntity
+            instances, in the order the pillar IDs were given
+
+        Example:
+            # Get ingredients for Digestion (2) and Immunity (3) at once
+            by_pillar = IngredientEntity.get_ingredients_by_pillars(db, [2, 3], limit=10)
+        """
+        results: Dict[int, List['IngredientEntity']] = {pillar_id: [] for pillar_id in pillar_ids}
+        if not results:
+            return results
+
+        # Same SQLite-compatible query and page as get_ingredients_by_pillar; the
+        # pillar match itself happens in Python
+        query = db.query(cls).filter(
+            func.json_extract(cls.health_outcomes, '$').isnot(None)
+        )
+
+        for ingredient in query.offset(skip).limit(limit).all():
+            if not isinstance(ingredient.health_outcomes, list):
+                continue
+
+            ingredient_pillars = set()
+            for outcome in ingredient.health_outcomes:
+                if isinstance(outcome, dict) and "pillars" in outcome:
+                    ingredient_pillars.update(outcome["pillars"])
+
+            for pillar_id in results:
+                if pillar_id in ingredient_pillars:
+                    results[pillar_id].append(ingredient)
+
+        return results
+
     @classmethod
     def filter_ingredients_by_pillars(
         cls,
@@ -5,18 +5,23 @@ This module provides functionality to interact with Anthropic Claude API and Ope
 to generate AI-powered meal plans based on user survey data and preferences.
 """
 
+import asyncio
+import hashlib
 import json
 import logging
-from typing import List, Dict, Any, Optional
-from anthropic import AsyncAnthropic
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Tuple
+import httpx
+import orjson
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
 from openai import AsyncOpenAI
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.orm import Session
 
 from ..config import get_settings
 from ..models.user import User
 from ..models.entity import IngredientEntity
-from ..models.health_pillars import HEALTH_PILLARS, get_pillar_name
 from ..schemas.meal_plan import DailyMealPlan
 
 logger = logging.getLogger(__name__)
@@ -27,96 +32,67 @@ class LLMResponseError(Exception):
     pass
 
 
-# Initialize the async clients
+# Transport tuning for the shared Anthropic client. HTTP/2 multiplexes concurrent
+# meal plan requests over one TLS connection, and the pool is sized above httpx's
+# default of 10 so bursts of users don't queue waiting for a free connection.
+# The read timeout stays generous because multi-day plans with recipes can take
+# well over a minute to generate.
+ANTHROPIC_HTTP_LIMITS = httpx.Limits(
+    max_connections=64,
+    max_keepalive_connections=32,
+    keepalive_expiry=30.0,
+)
+ANTHROPIC_HTTP_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+
 settings = get_settings()
-anthropic_client = AsyncAnthropic(api_key=settings.anthropic_api_key)
-openai_client = AsyncOpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
 
 
-def generate_meal_plan_prompt(survey_data: dict, num_days: int, include_recipes: bool, preferred_ingredients: Optional[List[str]] = None) -> str:
+@lru_cache(maxsize=1)
+def _get_anthropic_client() -> AsyncAnthropic:
     """
-    Generate a detailed prompt for the LLM to create a personalized meal plan.
+    Get the shared Anthropic client, creating it on first use.
 
-    Args:
-        survey_data: User's survey data including health pillars, dietary restrictions, etc.
-        num_days: Number of days for the meal plan
-        include_recipes: Whether to include detailed recipe information
-        preferred_ingredients: Optional list of ingredient names to prioritize based on health goals
+    Construction sets up the TLS context and connection pool, so it is deferred
+    until a meal plan is actually requested rather than paid at import time.
 
     Returns:
-        str: Formatted prompt for the LLM
+        AsyncAnthropic: Shared async Anthropic client
     """
-    # Extract survey data
-    health_pillars = survey_data.get("healthPillars", [])
-    dietary_restrictions = survey_data.get("dietaryRestrictions", [])
-    meal_complexity = survey_data.get("mealComplexity", "moderate")
-    disliked_ingredients = survey_data.get("dislikedIngredients", [])
-    meals_per_day = survey_data.get("mealsPerDay", "3-meals-2-snacks")
-    allergies = survey_data.get("allergies", [])
-    primary_goal = survey_data.get("primaryGoal", "")
+    return AsyncAnthropic(
+        api_key=settings.anthropic_api_key,
+        http_client=DefaultAsyncHttpxClient(
+            http2=True,
+            limits=ANTHROPIC_HTTP_LIMITS,
+            timeout=ANTHROPIC_HTTP_TIMEOUT,
+        ),
+    )
 
-    # Debug logging
-    logger.info(f"🎯 Health Pillars for LLM prompt: {health_pillars}")
-    logger.info(f"📊 Survey data keys: {list(survey_data.keys())}")
 
-    # Format critical constraints (allergies, dietary restrictions, disliked ingredients)
-    critical_constraints = ""
-    constraint_sections = []
+@lru_cache(maxsize=1)
+def _get_openai_client() -> Optional[AsyncOpenAI]:
+    """
+    Get the shared OpenAI client, creating it on first use.
 
-    # Allergy constraints - highest priority
-    if allergies:
-        allergy_list = ", ".join(allergies)
-        constraint_sections.append(f"""
-🚨 ALLERGY SAFETY CONSTRAINT 🚨
-The user has LIFE-THREATENING allergies to: {allergy_list}
-ABSOLUTELY FORBIDDEN: Never include these ingredients or any derivatives.
-- Check EVERY ingredient, seasoning, and garnish
-- Avoid related terms (e.g., "dairy" means no milk, cheese, butter, cream, yogurt, whey, casein)
-- When in doubt, exclude the ingredient
-This is a MEDICAL SAFETY requirement - violations could harm the user.
-""")
+    Returns:
+        Optional[AsyncOpenAI]: Shared async OpenAI client, or None if no API key is configured
+    """
+    return AsyncOpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
 
-    # Dietary restrictions - must be strictly followed
-    if dietary_restrictions:
-        restriction_details = {
-            "vegan": "NO animal products (meat, poultry, fish, seafood, eggs, dairy, honey)",
-            "vegetarian": "NO meat, poultry, fish, or seafood (eggs and dairy are OK)",
-            "gluten-free": "NO wheat, barley, rye, malt, or derivatives (bread, pasta, flour, beer, soy sauce)",
-            "dairy-free": "NO milk, cheese, butter, cream, yogurt, whey, casein, or derivatives",
-            "keto": "HIGH fat, MODERATE protein, VERY LOW carbs (<20g net carbs per day)",
-            "paleo": "NO grains, legumes, dairy, refined sugar, or processed foods"
-        }
-        restriction_list = [restriction_details.get(r, r) for r in dietary_restrictions]
-        constraint_sections.append(f"""
-DIETARY RESTRICTION MANDATE:
-{chr(10).join(f"- {r}" for r in restriction_list)}
-Verify that EVERY meal and ingredient complies with these restrictions.
-""")
 
-    # Disliked ingredients - must be avoided
-    if disliked_ingredients:
-        disliked_list = ", ".join(disliked_ingredients)
-        constraint_sections.append(f"""
-DISLIKED INGREDIENTS TO AVOID:
-The user dislikes: {disliked_list}
-Do NOT include these ingredients or feature them prominently in any meal.
-""")
+# Validator for a whole plan, compiled once instead of dispatching per day
+_DAILY_PLAN_LIST_ADAPTER = TypeAdapter(List[DailyMealPlan])
 
-    if constraint_sections:
-        critical_constraints = "\n" + "\n".join(constraint_sections)
+# Futures for generations still in flight so identical concurrent requests share one
+# API call, plus recently generated plans keyed by a hash of the generation inputs
+# (only populated when the opt-in response cache is enabled).
+# Both are only touched on the event loop thread with no await between lookup and
+# insert, so they need no lock.
+_RESPONSE_CACHE: "OrderedDict[str, List[DailyMealPlan]]" = OrderedDict()
+_INFLIGHT: Dict[str, asyncio.Future] = {}
 
-    # Determine meal structure
-    meal_structure_map = {
-        "3": "3 meals (breakfast, lunch, dinner)",
-        "3-meals-2-snacks": "3 main meals (breakfast, lunch, dinner) + 2 snacks (morning snack, afternoon snack)",
-        "6": "6 small meals throughout the day"
-    }
-    meal_structure = meal_structure_map.get(meals_per_day, "3 main meals + 2 snacks")
 
-    # Conditional recipe details section
-    recipe_section = ""
-    if include_recipes:
-        recipe_section = """
+# Static prompt fragments, built once at import instead of on every request.
+_RECIPE_SECTION_WITH = """
 For each meal, include:
 - "ingredients": Array of ingredients with measurements (e.g., ["2 cups oats", "1 banana"])
 - "servings": Number of servings (integer)
@@ -125,44 +101,129 @@ For each meal, include:
 - "instructions": Array of step-by-step cooking instructions
 - "nutrition": Object with detailed nutritional info (e.g., {"protein": "25g", "carbs": "40g", "fat": "15g", "fiber": "8g"})
 """
-    else:
-        recipe_section = """
+
+_RECIPE_SECTION_WITHOUT = """
 For each meal, only include the basic fields (type, name, calories, description).
 DO NOT include ingredients, servings, prep_time_minutes, cook_time_minutes, instructions, or nutrition fields.
 """
 
-    # Preferred ingredients section
-    preferred_ingredients_section = ""
-    if preferred_ingredients:
-        preferred_ingredients_section = f"""
-## PREFERRED INGREDIENTS
-Based on the user's health goals, prioritize using the following ingredients in the meal plan. You do not have to use all of them, but they should be featured prominently and creatively:
-{', '.join(preferred_ingredients)}
-"""
+# Example JSON structure (serialized up front to avoid brace-escaping issues in f-strings)
+_EXAMPLE_MEAL = {
+    "type": "breakfast",
+    "name": "Meal Name",
+    "calories": 400,
+    "description": "Brief description",
+    "tags": ["Gluten-Free", "High-Protein", "Quick-Meal"]
+}
+_EXAMPLE_RECIPE_FIELDS = {
+    "ingredients": ["ingredient 1", "ingredient 2"],
+    "servings": 2,
+    "prep_time_minutes": 10,
+    "cook_time_minutes": 15,
+    "instructions": ["step 1", "step 2"],
+    "nutrition": {"protein": "20g", "carbs": "45g", "fat": "12g"},
+}
+_EXAMPLE_JSON_WITH = json.dumps(
+    [{"day": "Day 1", "meals": [{**_EXAMPLE_MEAL, **_EXAMPLE_RECIPE_FIELDS}]}], indent=2
+)
+_EXAMPLE_JSON_WITHOUT = json.dumps([{"day": "Day 1", "meals": [_EXAMPLE_MEAL]}], indent=2)
+
+# JSON Schemas for OpenAI structured outputs. Strict mode requires every property
+# to be listed as required and objects to be closed, so the optional recipe fields
+# only appear in the schema variant that asks for recipes.
+_STRING_ARRAY_SCHEMA = {"type": "array", "items": {"type": "string"}}
+_MEAL_SCHEMA_PROPERTIES = {
+    "type": {"type": "string"},
+    "name": {"type": "string"},
+    "calories": {"type": "integer"},
+    "description": {"type": "string"},
+    "tags": _STRING_ARRAY_SCHEMA,
+}
+_RECIPE_SCHEMA_PROPERTIES = {
+    "ingredients": _STRING_ARRAY_SCHEMA,
+    "servings": {"type": "integer"},
+    "prep_time_minutes": {"type": "integer"},
+    "cook_time_minutes": {"type": "integer"},
+    "instructions": _STRING_ARRAY_SCHEMA,
+    "nutrition": {
+        "type": "object",
+        "properties": {macro: {"type": "string"} for macro in ("protein", "carbs", "fat", "fiber")},
+        "required": ["protein", "carbs", "fat", "fiber"],
+        "additionalProperties": False,
+    },
+}
+
+
+def _closed_object_schema(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Object schema with every property required and no extra keys (strict mode rules)."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
 
-    # Build an example JSON structure to avoid brace-escaping issues in f-strings
-    example_meal = {
-        "type": "breakfast",
-        "name": "Meal Name",
-        "calories": 400,
-        "description": "Brief description",
-        "tags": ["Gluten-Free", "High-Protein", "Quick-Meal"]
+def _meal_plan_response_format(include_recipes: bool) -> Dict[str, Any]:
+    """OpenAI response_format constraining output to {"plan": [DailyMealPlan, ...]}."""
+    meal_properties = {**_MEAL_SCHEMA_PROPERTIES, **(_RECIPE_SCHEMA_PROPERTIES if include_recipes else {})}
+    day_schema = _closed_object_schema({
+        "day": {"type": "string"},
+        "meals": {"type": "array", "items": _closed_object_schema(meal_properties)},
+    })
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "meal_plan",
+            "strict": True,
+            "schema": _closed_object_schema({"plan": {"type": "array", "items": day_schema}}),
+        },
     }
-    if include_recipes:
-        example_meal.update({
-            "ingredients": ["ingredient 1", "ingredient 2"],
-            "servings": 2,
-            "prep_time_minutes": 10,
-            "cook_time_minutes": 15,
-            "instructions": ["step 1", "step 2"],
-            "nutrition": {"protein": "20g", "carbs": "45g", "fat": "12g"},
-        })
-    example_day = {"day": "Day 1", "meals": [example_meal]}
-    example_json = json.dumps([example_day], indent=2)
-
-    # Build the complete prompt with constraints at the top
-    prompt = f"""You are FlavorLab's expert nutritionist and meal planning AI. Create a personalized {num_days}-day meal plan.
-{critical_constraints}
+
+
+_MEAL_PLAN_RESPONSE_FORMATS = {
+    include_recipes: _meal_plan_response_format(include_recipes) for include_recipes in (True, False)
+}
+
+# Model families that support Structured Outputs; other models get plain JSON mode
+_STRUCTURED_OUTPUT_MODEL_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-5")
+# The first gpt-4o snapshot predates Structured Outputs
+_STRUCTURED_OUTPUT_UNSUPPORTED_MODELS = {"gpt-4o-2024-05-13"}
+_JSON_OBJECT_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+def _supports_structured_outputs(model: str) -> bool:
+    """Whether an OpenAI model accepts a strict json_schema response_format."""
+    return model.startswith(_STRUCTURED_OUTPUT_MODEL_PREFIXES) and model not in _STRUCTURED_OUTPUT_UNSUPPORTED_MODELS
+
+
+_MEAL_STRUCTURE_MAP = {
+    "3": "3 meals (breakfast, lunch, dinner)",
+    "3-meals-2-snacks": "3 main meals (breakfast, lunch, dinner) + 2 snacks (morning snack, afternoon snack)",
+    "6": "6 small meals throughout the day"
+}
+
+# Number of meal entries per day for each mealsPerDay option (default: 3 meals + 2 snacks)
+_MEALS_PER_DAY_COUNT = {"3": 3, "3-meals-2-snacks": 5, "6": 6}
+
+# Output token budget per meal entry, with and without full recipe details
+_TOKENS_PER_MEAL_WITH_RECIPES = 550
+_TOKENS_PER_MEAL_WITHOUT_RECIPES = 150
+_MAX_OUTPUT_TOKENS = 8000
+
+# Plans with at least this many days (or with recipes) are validated in a worker thread
+_OFFLOAD_VALIDATION_MIN_DAYS = 3
+
+_DIETARY_RESTRICTION_DETAILS = {
+    "vegan": "NO animal products (meat, poultry, fish, seafood, eggs, dairy, honey)",
+    "vegetarian": "NO meat, poultry, fish, or seafood (eggs and dairy are OK)",
+    "gluten-free": "NO wheat, barley, rye, malt, or derivatives (bread, pasta, flour, beer, soy sauce)",
+    "dairy-free": "NO milk, cheese, butter, cream, yogurt, whey, casein, or derivatives",
+    "keto": "HIGH fat, MODERATE protein, VERY LOW carbs (<20g net carbs per day)",
+    "paleo": "NO grains, legumes, dairy, refined sugar, or processed foods"
+}
+
+_PROMPT_CHECKLIST = """
 ## CONSTRAINT VERIFICATION CHECKLIST
 Before finalizing each meal, verify:
 ✓ Contains NO allergens or their derivatives
@@ -177,7 +238,9 @@ For each meal you generate, you MUST populate the 'tags' array with labels that
 
 2. **Allergies (MANDATORY):** For EVERY allergy the user has (e.g., 'dairy', 'peanuts', 'shellfish'), you MUST add a corresponding "X-Free" tag (e.g., "Dairy-Free", "Peanut-Free", "Shellfish-Free"). This confirms safety. Include ALL allergy tags even if they seem obvious (e.g., "Shellfish-Free" for vegetarian meals).
 
-3. **Health Goal Tagging (CRITICAL):** For each meal, you MUST analyze its ingredients and nutritional benefits. If the meal directly supports one or more of the user's selected Health Goals (ONLY: {', '.join(health_pillars)}), you MUST add a tag for EACH supported goal. The tag MUST be the EXACT name of the Health Goal from the user profile (character-for-character match). This is the primary way the user will see the value of their personalized plan. Every meal should support at least one health goal. FORBIDDEN: Do NOT use "General Wellness" or any generic health terms - ONLY use the exact pillar names listed above.
+3. **Health Goal Tagging (CRITICAL):** For each meal, you MUST analyze its ingredients and nutritional benefits. If the meal directly supports one or more of the user's selected Health Goals (ONLY: """
+
+_PROMPT_TAGGING_RULES = """), you MUST add a tag for EACH supported goal. The tag MUST be the EXACT name of the Health Goal from the user profile (character-for-character match). This is the primary way the user will see the value of their personalized plan. Every meal should support at least one health goal. FORBIDDEN: Do NOT use "General Wellness" or any generic health terms - ONLY use the exact pillar names listed above.
 
 4. **Disliked Ingredients (OPTIONAL):** If the user dislikes an ingredient (e.g., 'cilantro'), and the meal avoids it, you MAY add a "No [Ingredient]" tag, but this is less critical.
 
@@ -186,35 +249,281 @@ For each meal you generate, you MUST populate the 'tags' array with labels that
 **Example:** If the user is 'gluten-free', 'vegetarian', has a 'dairy' allergy, and selected 'Improved Digestion' as a health pillar, a valid meal's tags would be ["Gluten-Free", "Vegetarian", "Dairy-Free", "Improved Digestion"].
 
 ## DAILY MEAL STRUCTURE MANDATE
-Each day MUST have exactly this structure: {meal_structure}
+Each day MUST have exactly this structure: """
 
-## USER PROFILE
-🎯 **EXACT Health Goal Names to Use in Tags (copy these exactly):**
-{chr(10).join(f'   - "{pillar}"' for pillar in health_pillars) if health_pillars else '   - None'}
+_PROMPT_JSON_MANDATE = """
 
-- Primary Goal: {primary_goal}
-- Dietary Restrictions: {', '.join(dietary_restrictions) if dietary_restrictions else 'None'}
-- Meal Complexity: {meal_complexity}
-- Disliked Ingredients: {', '.join(disliked_ingredients) if disliked_ingredients else 'None'}
-{preferred_ingredients_section}
+## JSON-ONLY MANDATE
+Respond ONLY with a JSON array. No markdown, no explanations, no code blocks.
+The JSON must be a valid array matching this structure (example only):
+
+"""
+
+_PROMPT_INTRO = "You are FlavorLab's expert nutritionist and meal planning AI. Create a personalized "
+
+# Static chunks of the constraint sections; each section is preceded by a blank line
+_ALLERGY_CONSTRAINT_HEADER = """
+
+🚨 ALLERGY SAFETY CONSTRAINT 🚨
+The user has LIFE-THREATENING allergies to: """
+
+_ALLERGY_CONSTRAINT_FOOTER = """
+ABSOLUTELY FORBIDDEN: Never include these ingredients or any derivatives.
+- Check EVERY ingredient, seasoning, and garnish
+- Avoid related terms (e.g., "dairy" means no milk, cheese, butter, cream, yogurt, whey, casein)
+- When in doubt, exclude the ingredient
+This is a MEDICAL SAFETY requirement - violations could harm the user.
+"""
+
+_DIETARY_RESTRICTION_HEADER = """
+
+DIETARY RESTRICTION MANDATE:
+"""
+
+_DIETARY_RESTRICTION_FOOTER = """Verify that EVERY meal and ingredient complies with these restrictions.
+"""
+
+_DISLIKED_INGREDIENTS_HEADER = """
+
+DISLIKED INGREDIENTS TO AVOID:
+The user dislikes: """
+
+_DISLIKED_INGREDIENTS_FOOTER = """
+Do NOT include these ingredients or feature them prominently in any meal.
+"""
+
+_USER_PROFILE_HEADER = "\n\n## USER PROFILE\n🎯 **EXACT Health Goal Names to Use in Tags (copy these exactly):**\n"
+
+_PREFERRED_INGREDIENTS_HEADER = """
+## PREFERRED INGREDIENTS
+Based on the user's health goals, prioritize using the following ingredients in the meal plan. You do not have to use all of them, but they should be featured prominently and creatively:
+"""
+
+_REQUIREMENTS_HEADER = """
 ## REQUIREMENTS
 1. Address all health goals through food choices
 2. Respect all dietary restrictions strictly (see detailed restrictions above)
 3. Avoid all disliked ingredients completely
 4. Match the specified meal complexity level
-5. Each day must follow the meal structure: {meal_structure}
+5. Each day must follow the meal structure: """
+
+_REQUIREMENTS_FOOTER = """
 6. Use specific ingredient names to avoid ambiguity (e.g., "plant-based milk" instead of "milk")
-{recipe_section}
+"""
 
-## JSON-ONLY MANDATE
-Respond ONLY with a JSON array. No markdown, no explanations, no code blocks.
-The JSON must be a valid array matching this structure (example only):
 
-{example_json}
+def _render_meal_structure_sections(meal_structure: str) -> Tuple[str, str]:
+    """Render the two prompt sections that embed the daily meal structure."""
+    return (
+        f"{_PROMPT_TAGGING_RULES}{meal_structure}{_USER_PROFILE_HEADER}",
+        f"{_REQUIREMENTS_HEADER}{meal_structure}{_REQUIREMENTS_FOOTER}",
+    )
+
 
-Generate the {num_days}-day meal plan now as pure JSON:"""
+# Tagging rules through the profile header, and the requirements list, rendered
+# once per supported mealsPerDay value
+_MEAL_STRUCTURE_SECTIONS = {
+    meals_per_day: _render_meal_structure_sections(structure)
+    for meals_per_day, structure in _MEAL_STRUCTURE_MAP.items()
+}
+_DEFAULT_MEAL_STRUCTURE_SECTIONS = _render_meal_structure_sections("3 main meals + 2 snacks")
 
-    return prompt
+
+def generate_meal_plan_prompt(
+    survey_data: dict,
+    num_days: int,
+    include_recipes: bool,
+    preferred_ingredients: Optional[List[str]] = None,
+    include_example: bool = True
+) -> str:
+    """
+    Generate a detailed prompt for the LLM to create a personalized meal plan.
+
+    Args:
+        survey_data: User's survey data including health pillars, dietary restrictions, etc.
+        num_days: Number of days for the meal plan
+        include_recipes: Whether to include detailed recipe information
+        preferred_ingredients: Optional list of ingredient names to prioritize based on health goals
+        include_example: Whether to include the JSON-only mandate and example output.
+            Providers that enforce the output schema themselves can skip it.
+
+    Returns:
+        str: Formatted prompt for the LLM
+    """
+    # Extract survey data
+    health_pillars = survey_data.get("healthPillars", [])
+    dietary_restrictions = survey_data.get("dietaryRestrictions", [])
+    meal_complexity = survey_data.get("mealComplexity", "moderate")
+    disliked_ingredients = survey_data.get("dislikedIngredients", [])
+    meals_per_day = survey_data.get("mealsPerDay", "3-meals-2-snacks")
+    allergies = survey_data.get("allergies", [])
+    primary_goal = survey_data.get("primaryGoal", "")
+
+    # Debug logging
+    logger.info("🎯 Health Pillars for LLM prompt: %s", health_pillars)
+    logger.info("📊 Survey data keys: %s", list(survey_data))
+
+    # Assemble the prompt from module-level chunks; only user values are formatted here
+    parts: List[str] = []
+    append = parts.append
+    append(_PROMPT_INTRO)
+    append(f"{num_days}-day meal plan.\n")
+
+    # Allergy constraints - highest priority
+    if allergies:
+        append(_ALLERGY_CONSTRAINT_HEADER)
+        append(", ".join(allergies))
+        append(_ALLERGY_CONSTRAINT_FOOTER)
+
+    # Dietary restrictions - must be strictly followed
+    if dietary_restrictions:
+        append(_DIETARY_RESTRICTION_HEADER)
+        for restriction in dietary_restrictions:
+            append("- ")
+            append(_DIETARY_RESTRICTION_DETAILS.get(restriction, restriction))
+            append("\n")
+        append(_DIETARY_RESTRICTION_FOOTER)
+
+    # Disliked ingredients - must be avoided
+    if disliked_ingredients:
+        append(_DISLIKED_INGREDIENTS_HEADER)
+        append(", ".join(disliked_ingredients))
+        append(_DISLIKED_INGREDIENTS_FOOTER)
+
+    # Pre-rendered sections for this plan shape
+    structure_section, requirements_section = _MEAL_STRUCTURE_SECTIONS.get(
+        meals_per_day, _DEFAULT_MEAL_STRUCTURE_SECTIONS
+    )
+
+    append(_PROMPT_CHECKLIST)
+    append(", ".join(health_pillars))
+    append(structure_section)
+    if health_pillars:
+        append("\n".join(f'   - "{pillar}"' for pillar in health_pillars))
+    else:
+        append("   - None")
+
+    append(f"\n\n- Primary Goal: {primary_goal}")
+    append(f"\n- Dietary Restrictions: {', '.join(dietary_restrictions) if dietary_restrictions else 'None'}")
+    append(f"\n- Meal Complexity: {meal_complexity}")
+    append(f"\n- Disliked Ingredients: {', '.join(disliked_ingredients) if disliked_ingredients else 'None'}\n")
+
+    # Preferred ingredients section
+    if preferred_ingredients:
+        append(_PREFERRED_INGREDIENTS_HEADER)
+        append(", ".join(preferred_ingredients))
+        append("\n")
+
+    append(requirements_section)
+
+    # Conditional recipe details section and example JSON (precomputed)
+    append(_RECIPE_SECTION_WITH if include_recipes else _RECIPE_SECTION_WITHOUT)
+    if include_example:
+        append(_PROMPT_JSON_MANDATE)
+        append(_EXAMPLE_JSON_WITH if include_recipes else _EXAMPLE_JSON_WITHOUT)
+    append(f"\n\nGenerate the {num_days}-day meal plan now as pure JSON:")
+    return "".join(parts)
+
+
+def _estimate_max_tokens(num_days: int, include_recipes: bool, meals_per_day: str) -> int:
+    """
+    Estimate an output token budget for a meal plan of the given shape.
+
+    Args:
+        num_days: Number of days for the meal plan
+        include_recipes: Whether to include detailed recipe information
+        meals_per_day: The survey's mealsPerDay option
+
+    Returns:
+        int: max_tokens to request, capped at _MAX_OUTPUT_TOKENS
+    """
+    per_meal = _TOKENS_PER_MEAL_WITH_RECIPES if include_recipes else _TOKENS_PER_MEAL_WITHOUT_RECIPES
+    meals = _MEALS_PER_DAY_COUNT.get(meals_per_day, 5)
+    return min(_MAX_OUTPUT_TOKENS, int(num_days * meals * per_meal * 1.25) + 200)
+
+
+def _meal_plan_cache_key(
+    survey_data: dict,
+    num_days: int,
+    include_recipes: bool,
+    preferred_ingredient_names: List[str],
+    provider: str,
+    model: str
+) -> str:
+    """Build a stable cache key for a meal plan generation request."""
+    payload = json.dumps(
+        {
+            "s": survey_data,
+            "n": num_days,
+            "r": include_recipes,
+            "p": sorted(preferred_ingredient_names),
+            "provider": provider,
+            "model": model,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _copy_plans(plans: List[DailyMealPlan]) -> List[DailyMealPlan]:
+    """Deep-copy plans so callers never share instances with the cache."""
+    return [plan.model_copy(deep=True) for plan in plans]
+
+
+async def _get_or_generate_meal_plan(
+    cache_key: str,
+    generate: Callable[[], Awaitable[List[DailyMealPlan]]]
+) -> List[DailyMealPlan]:
+    """
+    Generate a meal plan, sharing the work between identical requests.
+
+    Concurrent callers with the same key wait on the first caller's generation
+    instead of issuing their own API call. Finished plans are only reused for
+    later requests when LLM_RESPONSE_CACHE_SIZE is set, since regenerating
+    with the same inputs is expected to produce a fresh plan.
+
+    Args:
+        cache_key: Key from _meal_plan_cache_key
+        generate: Zero-argument coroutine factory that calls the LLM provider
+
+    Returns:
+        List[DailyMealPlan]: Validated list of daily meal plans
+    """
+    cache_size = settings.llm_response_cache_size
+    if cache_size > 0:
+        cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            _RESPONSE_CACHE.move_to_end(cache_key)
+            logger.info("Serving meal plan from response cache")
+            return _copy_plans(cached)
+
+    inflight = _INFLIGHT.get(cache_key)
+    if inflight is not None:
+        logger.info("Waiting on identical in-flight meal plan generation")
+        return _copy_plans(await asyncio.shield(inflight))
+
+    future = asyncio.get_running_loop().create_future()
+    _INFLIGHT[cache_key] = future
+    try:
+        plans = await generate()
+    except BaseException as e:
+        if isinstance(e, Exception):
+            future.set_exception(e)
+        else:
+            future.set_exception(LLMResponseError("Meal plan generation was cancelled"))
+        # Mark the exception as retrieved in case nobody else was waiting
+        future.exception()
+        raise
+    finally:
+        _INFLIGHT.pop(cache_key, None)
+
+    future.set_result(plans)
+    if cache_size > 0:
+        _RESPONSE_CACHE[cache_key] = plans
+        while len(_RESPONSE_CACHE) > cache_size:
+            _RESPONSE_CACHE.popitem(last=False)
+    return _copy_plans(plans)
 
 
 async def generate_llm_meal_plan_anthropic(
@@ -246,31 +555,42 @@ async def generate_llm_meal_plan_anthropic(
         preferred_ingredients=preferred_ingredient_names if preferred_ingredient_names else None
     )
 
-    logger.info(f"Generating meal plan with Anthropic Claude ({model}) for user {user_id}")
+    max_tokens = _estimate_max_tokens(
+        num_days, include_recipes, survey_data.get("mealsPerDay", "3-meals-2-snacks")
+    )
+
+    logger.info("Generating meal plan with Anthropic Claude (%s) for user %s", model, user_id)
 
-    message = await anthropic_client.messages.create(
+    # Streaming keeps the connection active for long generations; the text is
+    # parsed once the response is complete.
+    async with _get_anthropic_client().messages.stream(
         model=model,
-        max_tokens=8000,
+        max_tokens=max_tokens,
         messages=[
             {
                 "role": "user",
                 "content": prompt
             }
         ]
-    )
+    ) as stream:
+        response_text = "".join([text async for text in stream.text_stream]).strip()
 
-    response_text = message.content[0].text.strip()
-    logger.debug(f"Claude response: {response_text[:500]}...")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Claude response: %s...", response_text[:500])
 
     try:
-        meal_plan_data = json.loads(response_text)
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse Claude response as JSON: {e}")
-        logger.error(f"Response text: {response_text}")
+        meal_plan_data = orjson.loads(response_text)
+    except orjson.JSONDecodeError as e:
+        logger.error("Failed to parse Claude response as JSON: %s", e)
+        logger.error("Response text: %s", response_text)
         raise LLMResponseError(f"Claude returned invalid JSON: {e}")
 
-    validated_plans = [DailyMealPlan.model_validate(day) for day in meal_plan_data]
-    logger.info(f"Successfully generated and validated {len(validated_plans)} days with Claude")
+    # Validating multi-day or recipe-heavy plans is CPU-bound; keep it off the event loop
+    if num_days >= _OFFLOAD_VALIDATION_MIN_DAYS or include_recipes:
+        validated_plans = await asyncio.to_thread(_DAILY_PLAN_LIST_ADAPTER.validate_python, meal_plan_data)
+    else:
+        validated_plans = _DAILY_PLAN_LIST_ADAPTER.validate_python(meal_plan_data)
+    logger.info("Successfully generated and validated %d days with Claude", len(validated_plans))
     return validated_plans
 
 
@@ -296,17 +616,32 @@ async def generate_llm_meal_plan_openai(
     Returns:
         List[DailyMealPlan]: Validated list of daily meal plans
     """
+    openai_client = _get_openai_client()
     if not openai_client:
         raise LLMResponseError("OpenAI client not initialized. Check OPENAI_API_KEY in .env")
 
+    # Structured outputs constrain decoding to the meal plan schema, wrapped as
+    # {"plan": [...]} since the root must be an object, so the example JSON is left
+    # out of the prompt. Older models only get JSON mode and keep the example.
+    structured_outputs = _supports_structured_outputs(model)
+    if structured_outputs:
+        response_format = _MEAL_PLAN_RESPONSE_FORMATS[include_recipes]
+    else:
+        response_format = _JSON_OBJECT_RESPONSE_FORMAT
+
     prompt = generate_meal_plan_prompt(
         survey_data,
         num_days,
         include_recipes,
-        preferred_ingredients=preferred_ingredient_names if preferred_ingredient_names else None
+        preferred_ingredients=preferred_ingredient_names if preferred_ingredient_names else None,
+        include_example=not structured_outputs
     )
 
-    logger.info(f"Generating meal plan with OpenAI ({model}) for user {user_id}")
+    max_tokens = _estimate_max_tokens(
+        num_days, include_recipes, survey_data.get("mealsPerDay", "3-meals-2-snacks")
+    )
+
+    logger.info("Generating meal plan with OpenAI (%s) for user %s", model, user_id)
 
     response = await openai_client.chat.completions.create(
         model=model,
@@ -320,17 +655,18 @@ async def generate_llm_meal_plan_openai(
                 "content": prompt
             }
         ],
-        response_format={"type": "json_object"},
-        max_tokens=8000,
+        response_format=response_format,
+        max_tokens=max_tokens,
         temperature=0.7
     )
 
     response_text = response.choices[0].message.content.strip()
-    logger.debug(f"OpenAI response: {response_text[:500]}...")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("OpenAI response: %s...", response_text[:500])
 
     try:
         # OpenAI might wrap in a root object, handle both cases
-        parsed_json = json.loads(response_text)
+        parsed_json = orjson.loads(response_text)
 
         # If it's a single day object with "day" and "meals" keys, wrap it in an array
         if isinstance(parsed_json, dict) and "day" in parsed_json and "meals" in parsed_json:
@@ -352,13 +688,17 @@ async def generate_llm_meal_plan_openai(
         if not isinstance(meal_plan_data, list):
             raise ValueError("Response is not a list of daily meal plans")
 
-    except (json.JSONDecodeError, ValueError) as e:
-        logger.error(f"Failed to parse OpenAI response as JSON: {e}")
-        logger.error(f"Response text: {response_text}")
+    except (orjson.JSONDecodeError, ValueError) as e:
+        logger.error("Failed to parse OpenAI response as JSON: %s", e)
+        logger.error("Response text: %s", response_text)
         raise LLMResponseError(f"OpenAI returned invalid JSON: {e}")
 
-    validated_plans = [DailyMealPlan.model_validate(day) for day in meal_plan_data]
-    logger.info(f"Successfully generated and validated {len(validated_plans)} days with OpenAI")
+    # Validating multi-day or recipe-heavy plans is CPU-bound; keep it off the event loop
+    if num_days >= _OFFLOAD_VALIDATION_MIN_DAYS or include_recipes:
+        validated_plans = await asyncio.to_thread(_DAILY_PLAN_LIST_ADAPTER.validate_python, meal_plan_data)
+    else:
+        validated_plans = _DAILY_PLAN_LIST_ADAPTER.validate_python(meal_plan_data)
+    logger.info("Successfully generated and validated %d days with OpenAI", len(validated_plans))
     return validated_plans
 
 
@@ -400,27 +740,26 @@ async def generate_llm_meal_plan(
         if db is not None:
             user_health_goals = user.preferences.get("health_goals", [])
             if user_health_goals:
-                preferred_ingredients = []
-                for pillar_id in user_health_goals:
-                    try:
-                        pillar_ingredients = IngredientEntity.get_ingredients_by_pillar(
-                            db, pillar_id=pillar_id, limit=10
-                        )
-                        preferred_ingredients.extend(pillar_ingredients)
-                    except Exception as e:
-                        logger.warning(f"Could not fetch ingredients for pillar {pillar_id}: {e}")
-                        continue
-
-                # Deduplicate ingredients
-                seen = set()
-                unique_ingredients = [
-                    ing for ing in preferred_ingredients
-                    if not (ing.id in seen or seen.add(ing.id))
-                ]
-
-                # Extract ingredient names
-                preferred_ingredient_names = [ing.name for ing in unique_ingredients]
-                logger.info(f"Found {len(preferred_ingredient_names)} preferred ingredients for user {user.id}")
+                # One batched query for all pillars, run off the event loop so the
+                # blocking SQLAlchemy call doesn't stall other requests
+                try:
+                    ingredients_by_pillar = await asyncio.to_thread(
+                        IngredientEntity.get_ingredients_by_pillars,
+                        db,
+                        pillar_ids=user_health_goals,
+                        limit=10
+                    )
+                except Exception as e:
+                    logger.warning("Could not fetch ingredients for pillars %s: %s", user_health_goals, e)
+                    ingredients_by_pillar = {}
+
+                # Extract ingredient names, deduplicated by ingredient across pillars in order
+                preferred_ingredient_names = list({
+                    ing.id: ing.name
+                    for pillar_ingredients in ingredients_by_pillar.values()
+                    for ing in pillar_ingredients
+                }.values())
+                logger.info("Found %d preferred ingredients for user %s", len(preferred_ingredient_names), user.id)
 
         # Determine provider and model
         selected_provider = provider or settings.llm_provider
@@ -428,31 +767,40 @@ async def generate_llm_meal_plan(
 
         # Route to appropriate provider
         if selected_provider == "openai":
-            return await generate_llm_meal_plan_openai(
-                survey_data=survey_data,
-                num_days=num_days,
-                include_recipes=include_recipes,
-                preferred_ingredient_names=preferred_ingredient_names,
-                user_id=user.id,
-                model=selected_model if selected_model.startswith("gpt-") else "gpt-4o-mini"
-            )
+            generate = generate_llm_meal_plan_openai
+            selected_model = selected_model if selected_model.startswith("gpt-") else "gpt-4o-mini"
         else:  # Default to Anthropic
-            return await generate_llm_meal_plan_anthropic(
+            selected_provider = "anthropic"
+            generate = generate_llm_meal_plan_anthropic
+            selected_model = selected_model if selected_model.startswith("claude-") else "claude-3-5-haiku-20241022"
+
+        cache_key = _meal_plan_cache_key(
+            survey_data,
+            num_days,
+            include_recipes,
+            preferred_ingredient_names,
+            selected_provider,
+            selected_model
+        )
+        return await _get_or_generate_meal_plan(
+            cache_key,
+            lambda: generate(
                 survey_data=survey_data,
                 num_days=num_days,
                 include_recipes=include_recipes,
                 preferred_ingredient_names=preferred_ingredient_names,
                 user_id=user.id,
-                model=selected_model if selected_model.startswith("claude-") else "claude-3-5-haiku-20241022"
+                model=selected_model
             )
+        )
 
     except (ValueError, LLMResponseError):
         # Re-raise expected errors
         raise
     except ValidationError as e:
-        logger.error(f"Failed to validate LLM response against schema: {e}")
+        logger.error("Failed to validate LLM response against schema: %s", e)
         raise LLMResponseError(f"LLM response does not match expected schema: {e}")
     except Exception as e:
         # Catch any unexpected errors
-        logger.error(f"Unexpected error generating LLM meal plan: {e}")
+        logger.error("Unexpected error generating LLM meal plan: %s", e)
         raise LLMResponseError(f"Failed to generate meal plan: {e}")
@@ -42,7 +42,7 @@ def audit() -> Dict[str, Any]:
     try:
         items: List[Dict[str, Any]] = []
         for ing in db.query(IngredientEntity).all():
-            attrs = getattr(ing, "attributes", {}) or {}
+            attrs = ing.attributes or {}
             micros = attrs.get("nutrient_references")
             if isinstance(micros, dict) and "value" in micros:
                 micros = micros.get("value")
@@ -54,7 +54,7 @@ def audit() -> Dict[str, Any]:
 
             items.append({
                 "id": ing.id,
-                "name": getattr(ing, "name", ing.id),
+                "name": ing.name,
                 "missing_micros": not has_micros,
                 "has_macros_in_micros": has_macros,
                 "duplicates": duplicates,
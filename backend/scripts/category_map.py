@@ -6,10 +6,12 @@ using exact-name and substring rules. Slugs here must match seeded
 category slugs (see scripts/seed_categories.py).
 """
 
-from typing import Dict, List
+import re
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
 
 # Exact matches (case-sensitive names from the database) → list of category slugs
-NAME_TO_CATEGORY_SLUGS: Dict[str, List[str]] = {
+_NAME_TO_CATEGORY_SLUGS: Dict[str, List[str]] = {
     # Fruits/Berries
     "Blueberries": ["fruits", "berries"],
     "Elderberries": ["fruits", "berries"],
@@ -67,8 +69,42 @@ SUBSTRING_RULES: Dict[str, List[str]] = {
 }
 
 
+# Substring rule slugs in declaration order; bit i of a slug mask stands for _SLUGS[i]
+_SLUGS: Tuple[str, ...] = tuple(SUBSTRING_RULES)
+
+
+def _build_substring_matcher() -> Tuple["re.Pattern[str]", Dict[str, int]]:
+    """
+    Compile every SUBSTRING_RULES needle into a single pattern.
+
+    The pattern is a lookahead alternation, so one finditer call reports a match at
+    every position (overlapping matches included). Needles are tried longest
+    first, and each needle's slug bitmask includes the slugs of every needle it
+    contains, so the longest match at a position also accounts for the shorter ones.
+    """
+    needle_masks: Dict[str, int] = {}
+    for bit, slug in enumerate(_SLUGS):
+        for needle in SUBSTRING_RULES[slug]:
+            needle_masks[needle] = needle_masks.get(needle, 0) | (1 << bit)
+
+    expanded: Dict[str, int] = {}
+    for needle in needle_masks:
+        mask = 0
+        for other, other_mask in needle_masks.items():
+            if other in needle:
+                mask |= other_mask
+        expanded[needle] = mask
+
+    ordered = sorted(needle_masks, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(re.escape(n) for n in ordered) + "))")
+    return pattern, expanded
+
+
+_SUBSTRING_PATTERN, _NEEDLE_TO_MASK = _build_substring_matcher()
+
+
 # Optional mapping from free-form classifications (if present) → category slug
-CLASSIFICATION_TO_CATEGORY_SLUGS: Dict[str, str] = {
+_CLASSIFICATION_TO_CATEGORY_SLUGS: Dict[str, str] = {
     "fruits": "fruits",
     "fruit": "fruits",
     "berries": "berries",
@@ -93,4 +129,32 @@ CLASSIFICATION_TO_CATEGORY_SLUGS: Dict[str, str] = {
     "spices": "herbs-spices",
 }
 
+# Public read-only lookup tables; keys are already in their lookup form (classification keys lowercased)
+NAME_TO_CATEGORY_SLUGS: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+    {name: tuple(slugs) for name, slugs in _NAME_TO_CATEGORY_SLUGS.items()}
+)
+CLASSIFICATION_TO_CATEGORY_SLUGS: Mapping[str, str] = MappingProxyType(
+    {key.lower(): slug for key, slug in _CLASSIFICATION_TO_CATEGORY_SLUGS.items()}
+)
+
+
+def match_categories(name: str) -> List[str]:
+    """Category slugs from SUBSTRING_RULES only, in rule declaration order."""
+    mask = 0
+    for match in _SUBSTRING_PATTERN.finditer((name or "").lower()):
+        mask |= _NEEDLE_TO_MASK[match.group(1)]
+    if not mask:
+        return []
+    return [slug for bit, slug in enumerate(_SLUGS) if mask >> bit & 1]
+
+
+def classify(name: str) -> List[str]:
+    """
+    Category slugs for an ingredient name from exact-name and substring rules.
+
+    Exact-name slugs come first, followed by substring matches; duplicates are removed.
+    """
+    slugs: List[str] = list(NAME_TO_CATEGORY_SLUGS.get(name, ()))
+    slugs.extend(slug for slug in match_categories(name) if slug not in slugs)
+    return slugs
 
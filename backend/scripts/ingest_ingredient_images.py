@@ -16,41 +16,55 @@ Environment/config:
 """
 
 import argparse
-import json
 import os
 import re
 import sys
 import urllib.parse
-from typing import Dict, List, Optional, Set
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+import orjson
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 backend_dir = os.path.dirname(script_dir)
 sys.path.insert(0, backend_dir)
 
-from app.database import SessionLocal, Base, engine
-from app.config import get_settings
-from app.models import Entity, IngredientEntity, Category
 # Robust import whether run as module or script
 try:
     from .category_map import (
-        NAME_TO_CATEGORY_SLUGS,
-        SUBSTRING_RULES,
         CLASSIFICATION_TO_CATEGORY_SLUGS,
+        classify,
     )
 except Exception:
     sys.path.insert(0, script_dir)
     from category_map import (  # type: ignore
-        NAME_TO_CATEGORY_SLUGS,
-        SUBSTRING_RULES,
         CLASSIFICATION_TO_CATEGORY_SLUGS,
+        classify,
     )
 
 
+# Smart default transformation for thumbnails
+# f_auto: automatic format; q_auto: smart quality; c_fill,w_640,h_360 maintains 16:9 crop
+IMAGE_TRANSFORM = "f_auto,q_auto,c_fill,w_640,h_360"
+
+UNSPLASH_FEATURED_URL = "https://source.unsplash.com/featured/?"
+_ENCODED_UNSPLASH_FEATURED_URL = urllib.parse.quote(UNSPLASH_FEATURED_URL, safe="")
+# Keywords made only of these characters percent-encode to themselves, except ","
+_URL_SAFE_KEYWORDS = re.compile(r"[A-Za-z0-9_.~,-]*")
+
+# Rows per executemany batch for the bulk UPDATE/INSERT statements
+BATCH_SIZE = 10_000
+
+
+_SLUG_STRIP = re.compile(r"[^a-z0-9\s-]")
+_SLUG_DASH = re.compile(r"[\s-]+")
+
+
 def slugify(name: str) -> str:
-    value = name.lower().strip()
-    value = re.sub(r"[^a-z0-9\s-]", "", value)
-    value = re.sub(r"[\s-]+", "-", value).strip("-")
-    return value
+    return _SLUG_DASH.sub("-", _SLUG_STRIP.sub("", name.lower().strip())).strip("-")
 
 
 def cloudinary_base_url(settings) -> Optional[str]:
@@ -69,9 +83,7 @@ def _bool_from_env(value: Optional[str], default: bool = False) -> bool:
 
 
 def build_image_url(base: str, folder: str, slug: str, settings, keyword_override: Optional[str] = None, *, use_unsplash: Optional[bool] = None, proxy_fetch: Optional[bool] = None) -> str:
-    # Provide a smart default transformation for thumbnails
-    # f_auto: automatic format; q_auto: smart quality; c_fill,w_640,h_360 maintains 16:9 crop
-    transform = "f_auto,q_auto,c_fill,w_640,h_360"
+    transform = IMAGE_TRANSFORM
 
     # If configured, use Cloudinary fetch with Unsplash Source keyword per slug for dev/demo
     # Example: image/fetch/f_auto,q_auto,.../https%3A%2F%2Fsource.unsplash.com%2Ffeatured%2F%3Fblueberries
@@ -83,14 +95,18 @@ def build_image_url(base: str, folder: str, slug: str, settings, keyword_overrid
     if use_unsplash:
         # Use keywords derived from slug; replace dashes with commas to broaden search
         keywords = (keyword_override or slug).replace("-", ",")
-        fetch_url = f"https://source.unsplash.com/featured/?{keywords}"
+        fetch_url = f"{UNSPLASH_FEATURED_URL}{keywords}"
         if proxy_fetch:
             # Use image/fetch as proxy and URL-encode the remote URL
             if base.endswith("/image/upload"):
                 fetch_base = base[:-len("/image/upload")] + "/image/fetch"
             else:
                 fetch_base = f"https://res.cloudinary.com/{settings.cloudinary_cloud_name}/image/fetch"
-            encoded = urllib.parse.quote(fetch_url, safe="")
+            if _URL_SAFE_KEYWORDS.fullmatch(keywords):
+                # Only commas need escaping; the constant prefix is encoded once at import
+                encoded = _ENCODED_UNSPLASH_FEATURED_URL + keywords.replace(",", "%2C")
+            else:
+                encoded = urllib.parse.quote(fetch_url, safe="")
             return f"{fetch_base}/{transform}/{encoded}"
         else:
             # Direct Unsplash Source URL; let the frontend load it as-is
@@ -100,32 +116,167 @@ def build_image_url(base: str, folder: str, slug: str, settings, keyword_overrid
     return f"{base}/{transform}/{folder}/{slug}.jpg"
 
 
-def _collect_categories_by_slug(db) -> Dict[str, Category]:
-    cats = db.query(Category).all()
-    return {c.slug: c for c in cats}
+def _collect_category_ids_by_slug(db) -> Dict[str, int]:
+    from sqlalchemy import select
+    from app.models import Category
+
+    return dict(db.execute(select(Category.slug, Category.id)).all())
 
 
-def _infer_category_slugs(name: str, classifications: Optional[List[str]]) -> Set[str]:
-    slugs: Set[str] = set()
-    # Exact name mapping
-    if name in NAME_TO_CATEGORY_SLUGS:
-        slugs.update(NAME_TO_CATEGORY_SLUGS[name])
+def _collect_existing_category_slugs(db) -> Dict[str, Set[str]]:
+    from sqlalchemy import select
+    from app.models import Category, IngredientCategory
+
+    existing: Dict[str, Set[str]] = defaultdict(set)
+    links = select(IngredientCategory.c.ingredient_id, Category.slug).join(
+        Category, Category.id == IngredientCategory.c.category_id
+    )
+    for ingredient_id, slug in db.execute(links):
+        existing[ingredient_id].add(slug)
+    return existing
+
+
+@lru_cache(maxsize=4096)
+def _infer_category_slugs(name: str, classifications: Tuple[str, ...] = ()) -> FrozenSet[str]:
+    # Exact name mapping and substring heuristics
+    slugs: Set[str] = set(classify(name))
 
     # Classification hints
-    for cls in (classifications or []):
+    for cls in classifications:
         key = (cls or "").strip().lower()
         if key in CLASSIFICATION_TO_CATEGORY_SLUGS:
             slug = CLASSIFICATION_TO_CATEGORY_SLUGS[key]
             slugs.add(slug)
             if slug in {"leafy-greens", "root-vegetables"}:
                 slugs.add("vegetables")
-
-    # Substring heuristics
-    lname = (name or "").lower()
-    for slug, needles in SUBSTRING_RULES.items():
-        if any(n in lname for n in needles):
-            slugs.add(slug)
-    return slugs
+    return frozenset(slugs)
+
+
+def _batched(rows: Iterable[Dict[str, Any]], size: int = BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    it = iter(rows)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def ingest_ingredients(
+    db,
+    base: str,
+    folder: str,
+    settings,
+    slug_to_keywords: Dict[str, str],
+    slug_to_serving: Dict[str, Dict[str, Any]],
+    *,
+    use_unsplash: Optional[bool] = None,
+    proxy_fetch: Optional[bool] = None,
+) -> Tuple[int, int]:
+    """
+    Backfill slug, display_name, image_url, serving size and category links.
+
+    Changes are collected in one pass over the ingredients and written with
+    batched executemany statements: one bulk UPDATE for entity columns and one
+    INSERT into the ingredient/category association table. The caller owns the
+    transaction (commit or rollback).
+
+    Returns:
+        Tuple of (ingredients updated, category links created)
+    """
+    from sqlalchemy import select, update
+    from app.models import Entity, IngredientEntity, IngredientCategory
+
+    # Snapshot settings once; direct Cloudinary URLs only need the slug appended
+    if use_unsplash is None:
+        use_unsplash = getattr(settings, "cloudinary_use_unsplash_fallback", False)
+    if proxy_fetch is None:
+        proxy_fetch = getattr(settings, "cloudinary_proxy_fetch", False)
+    url_prefix = f"{base}/{IMAGE_TRANSFORM}/{folder}/"
+
+    slug_to_category_id = _collect_category_ids_by_slug(db)
+    existing_category_slugs = _collect_existing_category_slugs(db)
+    update_rows: List[Dict[str, Any]] = []
+    assoc_rows: List[Dict[str, Any]] = []
+
+    # Plain column rows streamed in chunks; no ORM instances are hydrated or tracked
+    ingredients = db.execute(
+        select(
+            IngredientEntity.id,
+            IngredientEntity.name,
+            IngredientEntity.slug,
+            IngredientEntity.display_name,
+            IngredientEntity.image_url,
+            IngredientEntity.attributes,
+            IngredientEntity.classifications,
+        ).execution_options(yield_per=1000)
+    )
+    for ing in ingredients:
+        row: Dict[str, Any] = {}
+
+        # Ensure slug
+        slug = ing.slug
+        if not slug:
+            slug = row["slug"] = slugify(ing.name)
+
+        # Ensure display_name defaults to name
+        if not ing.display_name:
+            row["display_name"] = ing.name
+
+        # Ensure image_url (or update when using keyword overrides or cloud name mismatch)
+        override = slug_to_keywords.get(slug or "")
+        if override or not ing.image_url:
+            if use_unsplash:
+                row["image_url"] = build_image_url(
+                    base,
+                    folder,
+                    slug,
+                    settings,
+                    override,
+                    use_unsplash=use_unsplash,
+                    proxy_fetch=proxy_fetch,
+                )
+            else:
+                row["image_url"] = f"{url_prefix}{slug}.jpg"
+
+        # Ensure serving size metadata
+        serving_info = slug_to_serving.get(slug or "")
+        if serving_info:
+            target_value = serving_info.get("serving_size_g")
+            source_value = serving_info.get("serving_size_g_source")
+            attrs: Dict[str, Any] = dict(ing.attributes or {})
+            current_serving = attrs.get("serving_size_g", {}).get("value") if isinstance(attrs.get("serving_size_g"), dict) else attrs.get("serving_size_g")
+            if target_value and current_serving != target_value:
+                attrs["serving_size_g"] = {"value": target_value, "source": source_value}
+                row["attributes"] = attrs
+            current_source = attrs.get("serving_size_g_source", {}).get("value") if isinstance(attrs.get("serving_size_g_source"), dict) else attrs.get("serving_size_g_source")
+            if source_value and current_source != source_value:
+                attrs["serving_size_g_source"] = {"value": source_value}
+                row["attributes"] = attrs
+
+        # Prepare category links
+        desired_slugs = _infer_category_slugs(ing.name, tuple(ing.classifications or ()))
+        added_link = False
+        if desired_slugs:
+            for cat_slug in desired_slugs.difference(existing_category_slugs.get(ing.id, ())):
+                category_id = slug_to_category_id.get(cat_slug)
+                if category_id:
+                    assoc_rows.append({"ingredient_id": ing.id, "category_id": category_id})
+                    added_link = True
+
+        if row:
+            row["id"] = ing.id
+            update_rows.append(row)
+        elif added_link:
+            update_rows.append({"id": ing.id})
+
+    # Bulk UPDATE by primary key; rows with only an id just count as updated
+    for batch in _batched(row for row in update_rows if len(row) > 1):
+        db.execute(update(Entity), batch)
+    for batch in _batched(assoc_rows):
+        db.execute(IngredientCategory.insert(), batch)
+
+    return len(update_rows), len(assoc_rows)
+
+
+class _DryRunRollback(Exception):
+    """Raised inside the ingest transaction to roll it back for --dry-run."""
 
 
 def main() -> None:
@@ -133,6 +284,10 @@ def main() -> None:
     parser.add_argument("--dry-run", action="store_true")
     args = parser.parse_args()
 
+    # Deferred so --help doesn't pay for loading SQLAlchemy, models and the DB engine
+    from app.config import get_settings
+    from app.database import SessionLocal, Base, engine
+
     settings = get_settings()
 
     # Ingredient-specific overrides (fallback to legacy single-variable config)
@@ -161,8 +316,7 @@ def main() -> None:
     slug_to_keywords: Dict[str, str] = {}
     try:
         if os.path.exists(keywords_path):
-            with open(keywords_path, 'r', encoding='utf-8') as f:
-                slug_to_keywords = json.load(f)
+            slug_to_keywords = orjson.loads(Path(keywords_path).read_bytes())
     except Exception as e:
         print(f"Warning: failed to load image_keywords.json: {e}")
 
@@ -171,92 +325,37 @@ def main() -> None:
     slug_to_serving: Dict[str, Dict[str, any]] = {}
     try:
         if os.path.exists(serving_sizes_path):
-            with open(serving_sizes_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for item in data.get('items', []):
-                    slug = item.get('slug')
-                    if slug:
-                        slug_to_serving[slug] = item
+            data = orjson.loads(Path(serving_sizes_path).read_bytes())
+            for item in data.get('items', []):
+                slug = item.get('slug')
+                if slug:
+                    slug_to_serving[slug] = item
     except Exception as e:
         print(f"Warning: failed to load serving_sizes.json: {e}")
 
     db = SessionLocal()
-    updated = 0
-    cat_assignments = 0
     try:
-        slug_to_category = _collect_categories_by_slug(db)
-        ingredients = db.query(IngredientEntity).all()
-        for ing in ingredients:
-            changed = False
-
-            # Ensure slug
-            if not getattr(ing, "slug", None):
-                ing.slug = slugify(ing.name)
-                changed = True
-
-            # Ensure display_name defaults to name
-            if not getattr(ing, "display_name", None):
-                ing.display_name = ing.name
-                changed = True
-
-            # Ensure image_url (or update when using keyword overrides or cloud name mismatch)
-            override = slug_to_keywords.get(ing.slug or "")
-            current_url = getattr(ing, "image_url", None)
-            should_set_image = override or not current_url
-            if should_set_image:
-                ing.image_url = build_image_url(
-                    base,
-                    folder,
-                    ing.slug,
-                    settings,
-                    override,
-                    use_unsplash=ingredient_use_unsplash,
-                    proxy_fetch=ingredient_proxy_fetch,
-                )
-                changed = True
-
-            # Ensure serving size metadata
-            serving_info = slug_to_serving.get(ing.slug or "")
-            if serving_info:
-                target_value = serving_info.get("serving_size_g")
-                source_value = serving_info.get("serving_size_g_source")
-                attrs: Dict[str, Dict[str, any]] = ing.attributes or {}
-                current_serving = attrs.get("serving_size_g", {}).get("value") if isinstance(attrs.get("serving_size_g"), dict) else attrs.get("serving_size_g")
-                if target_value and current_serving != target_value:
-                    attrs["serving_size_g"] = {"value": target_value, "source": source_value}
-                    changed = True
-                current_source = attrs.get("serving_size_g_source", {}).get("value") if isinstance(attrs.get("serving_size_g_source"), dict) else attrs.get("serving_size_g_source")
-                if source_value and current_source != source_value:
-                    attrs["serving_size_g_source"] = {"value": source_value}
-                    changed = True
-                ing.attributes = attrs
-
-            # Prepare category links
-            desired_slugs = _infer_category_slugs(ing.name, getattr(ing, "classifications", []) or [])
-            if desired_slugs:
-                # Ensure relationship set exists
-                existing_slugs = {c.slug for c in getattr(ing, "categories", []) or []}
-                to_add = [slug for slug in desired_slugs if slug not in existing_slugs]
-                for slug in to_add:
-                    cat = slug_to_category.get(slug)
-                    if cat:
-                        ing.categories.append(cat)
-                        changed = True
-                        cat_assignments += 1
-
-            if changed:
-                updated += 1
-
-        if args.dry_run:
-            db.rollback()
-            print(f"[DRY RUN] Would update {updated} ingredients and create {cat_assignments} category links")
-        else:
-            db.commit()
-            print(f"Updated {updated} ingredients with slug/display/image_url and {cat_assignments} category links")
+        # One transaction for the whole backfill; --dry-run unwinds it via the sentinel
+        with db.begin():
+            updated, cat_assignments = ingest_ingredients(
+                db,
+                base,
+                folder,
+                settings,
+                slug_to_keywords,
+                slug_to_serving,
+                use_unsplash=ingredient_use_unsplash,
+                proxy_fetch=ingredient_proxy_fetch,
+            )
+            if args.dry_run:
+                raise _DryRunRollback()
+    except _DryRunRollback:
+        print(f"[DRY RUN] Would update {updated} ingredients and create {cat_assignments} category links")
     except Exception as e:
-        db.rollback()
         print(f"Error during ingestion: {e}")
         raise
+    else:
+        print(f"Updated {updated} ingredients with slug/display/image_url and {cat_assignments} category links")
     finally:
         db.close()
 
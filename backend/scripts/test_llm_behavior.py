@@ -15,7 +15,7 @@ import asyncio
 import json
 import sys
 import os
-from typing import Dict, Any, List
+from typing import Awaitable, Dict, Any, List, Tuple
 from datetime import datetime
 
 # Add backend directory to path
@@ -27,6 +27,7 @@ sys.path.insert(0, backend_dir)
 from app.database import SessionLocal
 from app.models.user import User
 from app.models.health_pillars import HEALTH_PILLARS
+from app.schemas.meal_plan import DailyMealPlan
 from app.services import llm_service
 
 
@@ -109,6 +110,17 @@ PERSONAS = [
 ]
 
 
+# Safe compound ingredients that should NOT trigger violations
+SAFE_COMPOUNDS: Dict[str, Tuple[str, ...]] = {
+    "butter": ("almond butter", "peanut butter", "cashew butter", "sunflower butter"),
+    "cream": ("coconut cream", "cashew cream", "oat cream"),
+    "milk": ("coconut milk", "almond milk", "oat milk", "soy milk", "cashew milk"),
+    "bread": ("gluten-free bread",),
+    "cheese": ("cashew cheese", "nutritional yeast"),
+    "yogurt": ("coconut yogurt", "almond yogurt"),
+}
+
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -155,16 +167,6 @@ def check_violations(meal, violations_config: Dict[str, List[str]]) -> List[str]
         " ".join(meal.ingredients or []).lower() if meal.ingredients else ""
     ])
 
-    # Safe compound ingredients that should NOT trigger violations
-    safe_compounds = {
-        "butter": ["almond butter", "peanut butter", "cashew butter", "sunflower butter"],
-        "cream": ["coconut cream", "cashew cream", "oat cream"],
-        "milk": ["coconut milk", "almond milk", "oat milk", "soy milk", "cashew milk"],
-        "bread": ["gluten-free bread"],
-        "cheese": ["cashew cheese", "nutritional yeast"],
-        "yogurt": ["coconut yogurt", "almond yogurt"]
-    }
-
     # Check each violation category
     for category, banned_items in violations_config.items():
         for item in banned_items:
@@ -173,12 +175,10 @@ def check_violations(meal, violations_config: Dict[str, List[str]]) -> List[str]
             # Check if the banned item appears in text
             if item_lower in searchable_text:
                 # Check if it's actually a safe compound ingredient
-                is_safe = False
-                if item_lower in safe_compounds:
-                    for safe_variant in safe_compounds[item_lower]:
-                        if safe_variant in searchable_text:
-                            is_safe = True
-                            break
+                is_safe = any(
+                    safe_variant in searchable_text
+                    for safe_variant in SAFE_COMPOUNDS.get(item_lower, ())
+                )
 
                 # Only report as violation if not a safe compound
                 if not is_safe:
@@ -209,6 +209,9 @@ def analyze_meal_structure(plan, expected_structure: str) -> str:
         return f"⚠️  Meal structure mismatch: Expected {expected_count}, got {actual_count} meals"
 
 
+SEPARATOR = "=" * 80
+
+
 def print_separator(char="=", length=80):
     """Print a separator line."""
     print(char * length)
@@ -216,22 +219,32 @@ def print_separator(char="=", length=80):
 
 def print_header(text: str):
     """Print a formatted header."""
-    print_separator()
-    print(f"  {text}")
-    print_separator()
+    print(f"{SEPARATOR}\n  {text}\n{SEPARATOR}")
 
 
 # ============================================================================
 # MAIN TEST RUNNER
 # ============================================================================
 
-async def test_persona(persona: Dict[str, Any], db):
-    """Test a single persona and report results."""
+async def generate_persona_plan(persona: Dict[str, Any]) -> List[DailyMealPlan]:
+    """Generate a persona's meal plan using its own database session."""
+    db = SessionLocal()
+    try:
+        return await llm_service.generate_llm_meal_plan(
+            user=create_mock_user(persona),
+            num_days=1,
+            include_recipes=True,
+            db=db
+        )
+    finally:
+        db.close()
+
+
+async def test_persona(persona: Dict[str, Any], generation: Awaitable[List[DailyMealPlan]]):
+    """Report results for a single persona once its meal plan generation finishes."""
     print_header(f"TESTING PERSONA: {persona['name']}")
     print(f"Description: {persona['description']}\n")
 
-    # Create mock user
-    mock_user = create_mock_user(persona)
     print(f"Health Goals: {persona['survey_data']['healthPillars']}")
     print(f"Dietary Restrictions: {persona['survey_data']['dietaryRestrictions']}")
     print(f"Allergies: {persona['survey_data']['allergies']}")
@@ -240,14 +253,9 @@ async def test_persona(persona: Dict[str, Any], db):
     print()
 
     try:
-        # Generate meal plan
+        # Wait for the meal plan (generated concurrently with the other personas)
         print("🔄 Generating meal plan with Claude Haiku...")
-        daily_plans = await llm_service.generate_llm_meal_plan(
-            user=mock_user,
-            num_days=1,
-            include_recipes=True,
-            db=db
-        )
+        daily_plans = await generation
 
         print("✅ Meal plan generated successfully!\n")
 
@@ -289,11 +297,8 @@ async def test_persona(persona: Dict[str, Any], db):
                 print(f"  Description: {meal.description}")
 
                 if meal.ingredients:
-                    print(f"  Ingredients: {', '.join(meal.ingredients[:5])}", end="")
-                    if len(meal.ingredients) > 5:
-                        print(f" ... ({len(meal.ingredients)} total)")
-                    else:
-                        print()
+                    more = f" ... ({len(meal.ingredients)} total)" if len(meal.ingredients) > 5 else ""
+                    print(f"  Ingredients: {', '.join(meal.ingredients[:5])}{more}")
 
                 if meal.nutrition:
                     print(f"  Nutrition: Protein {meal.nutrition.get('protein', 'N/A')}, "
@@ -358,22 +363,18 @@ async def main():
     print(f"Test Run: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Total Personas: {len(PERSONAS)}\n")
 
-    # Create database session
-    db = SessionLocal()
+    # Start every generation up front; the LLM calls are I/O bound, so they overlap
+    # while the reports below are still printed one persona at a time
+    generations = [asyncio.create_task(generate_persona_plan(persona)) for persona in PERSONAS]
 
     try:
         # Test each persona
-        for idx, persona in enumerate(PERSONAS, 1):
+        for idx, (persona, generation) in enumerate(zip(PERSONAS, generations), 1):
             print(f"\n{'='*80}")
             print(f"PERSONA {idx}/{len(PERSONAS)}")
             print(f"{'='*80}\n")
 
-            await test_persona(persona, db)
-
-            # Brief pause between tests to avoid rate limiting
-            if idx < len(PERSONAS):
-                print("⏳ Pausing 2 seconds before next test...")
-                await asyncio.sleep(2)
+            await test_persona(persona, generation)
 
         # Final summary
         print_header("TEST SUITE COMPLETE")
@@ -385,8 +386,8 @@ async def main():
         print_separator()
 
     finally:
-        db.close()
-        print("\n🔒 Database session closed.")
+        for generation in generations:
+            generation.cancel()
 
 
 # ============================================================================
@@ -19,7 +19,7 @@ import time
 import json
 import statistics
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Dict, Any
 import sys
 import os
 
@@ -423,3 +423,35 @@ class TestUserPreferences:
         assert response.status_code == 200
         data = response.json()
         assert data["preferences"] is None
+
+
+class TestLLMMealPlan:
+    """Test LLM meal plan generation endpoint."""
+
+    def test_generate_llm_meal_plan(self, authenticated_client, monkeypatch):
+        """Test the generated plan is saved and returned as JSON."""
+        from app.schemas.meal_plan import DailyMealPlan
+        from app.services import llm_service
+
+        async def fake_generate(**kwargs):
+            return [DailyMealPlan.model_validate({
+                "day": "Day 1",
+                "meals": [{
+                    "type": "breakfast",
+                    "name": "Oats",
+                    "calories": 300,
+                    "tags": ["Vegetarian"],
+                    "nutrition": {"protein": "10g", "carbs": "50g", "fat": "5g"},
+                }],
+            })]
+
+        monkeypatch.setattr(llm_service, "generate_llm_meal_plan", fake_generate)
+
+        response = authenticated_client.post("/api/v1/users/me/llm-meal-plan")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        meal = response.json()["plan"][0]["meals"][0]
+        assert meal["name"] == "Oats"
+        assert meal["id"] is not None
+        assert meal["nutrition"] == {"protein": "10g", "carbs": "50g", "fat": "5g"}
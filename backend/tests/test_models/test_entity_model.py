@@ -244,6 +244,49 @@ class TestIngredientEntityModel:
         assert second_compound["unit"] == "g/100g"
         assert "added_at" in second_compound
 
+    def test_get_ingredients_by_pillars(self, db_session):
+        """Test fetching ingredients for several pillars in one query."""
+        pillar_map = {
+            "ginger": [2, 8],
+            "salmon": [8],
+            "spinach": [1],
+            "plain_rice": [],
+        }
+        for ingredient_id, pillars in pillar_map.items():
+            db_session.add(IngredientEntity(
+                id=ingredient_id,
+                name=ingredient_id.replace("_", " ").title(),
+                primary_classification="ingredient",
+                health_outcomes=[{"outcome": "Test", "confidence": 3, "pillars": pillars}]
+            ))
+        db_session.commit()
+
+        by_pillar = IngredientEntity.get_ingredients_by_pillars(db_session, [8, 2, 5])
+
+        assert list(by_pillar) == [8, 2, 5]
+        assert sorted(ing.id for ing in by_pillar[8]) == ["ginger", "salmon"]
+        assert [ing.id for ing in by_pillar[2]] == ["ginger"]
+        assert by_pillar[5] == []
+
+    def test_get_ingredients_by_pillars_limit(self, db_session):
+        """Test that batched pillar queries scan the same page as per-pillar queries."""
+        for i, pillars in enumerate([[1], [3], [1, 2], [2], [1, 2]]):
+            db_session.add(IngredientEntity(
+                id=f"ingredient_{i}",
+                name=f"Ingredient {i}",
+                primary_classification="ingredient",
+                health_outcomes=[{"outcome": "Test", "confidence": 3, "pillars": pillars}]
+            ))
+        db_session.commit()
+
+        by_pillar = IngredientEntity.get_ingredients_by_pillars(db_session, [1, 2], limit=3)
+
+        for pillar_id in (1, 2):
+            expected = IngredientEntity.get_ingredients_by_pillar(db_session, pillar_id=pillar_id, limit=3)
+            assert [ing.id for ing in by_pillar[pillar_id]] == [ing.id for ing in expected]
+        assert [ing.id for ing in by_pillar[2]] == ["ingredient_2"]
+        assert IngredientEntity.get_ingredients_by_pillars(db_session, []) == {}
+
 
 class TestNutrientEntityModel:
     """Test the NutrientEntity model."""
@@ -0,0 +1,79 @@
+"""
+Tests for the ingredient category mapping heuristics.
+
+This module tests scripts/category_map.py name classification against
+the exact-name and substring rules it is built from.
+"""
+
+import pytest
+
+from scripts.category_map import (
+    CLASSIFICATION_TO_CATEGORY_SLUGS,
+    NAME_TO_CATEGORY_SLUGS,
+    SUBSTRING_RULES,
+    classify,
+    match_categories,
+)
+
+
+def naive_classify(name):
+    """Reference implementation: exact-name lookup plus a plain substring scan."""
+    slugs = set(NAME_TO_CATEGORY_SLUGS.get(name, ()))
+    lname = (name or "").lower()
+    for slug, needles in SUBSTRING_RULES.items():
+        if any(needle in lname for needle in needles):
+            slugs.add(slug)
+    return slugs
+
+
+class TestClassify:
+    """Test classify."""
+
+    @pytest.mark.parametrize("name", [
+        "Blueberries",
+        "Kefir",
+        "Beetroot Juice",
+        "Fish Stock",
+        "Creamed Kale",
+        "Green Onion",
+        "Plain Rice",
+        "",
+    ])
+    def test_matches_naive_substring_scan(self, name):
+        """classify returns the same slugs as scanning every rule."""
+        assert set(classify(name)) == naive_classify(name)
+
+    def test_exact_name_slugs_come_first(self):
+        """Exact-name mappings lead the result, followed by substring hits."""
+        assert classify("Sweet Potato") == ["vegetables", "root-vegetables"]
+        assert classify("Beet Juice")[:1] == ["juices"]
+
+    def test_needle_in_multiple_rules(self):
+        """A needle listed under several slugs yields all of them."""
+        assert set(classify("homemade kefir")) == {"dairy", "fermented"}
+
+    def test_no_duplicate_slugs(self):
+        """Repeated matches of the same slug are collapsed."""
+        slugs = classify("Berry berries with blueberry juice")
+        assert len(slugs) == len(set(slugs))
+
+    def test_match_categories_ignores_exact_names(self):
+        """match_categories only applies the substring rules."""
+        assert match_categories("Sweet Potato") == []
+        assert match_categories("Wild Salmon Broth") == ["seafood", "broths"]
+
+
+class TestLookupTables:
+    """Test the frozen lookup tables."""
+
+    def test_tables_are_read_only(self):
+        """The module-level mappings cannot be mutated by callers."""
+        with pytest.raises(TypeError):
+            NAME_TO_CATEGORY_SLUGS["Kale"] = ("vegetables",)
+        with pytest.raises(TypeError):
+            CLASSIFICATION_TO_CATEGORY_SLUGS["grains"] = "grains"
+        assert all(isinstance(slugs, tuple) for slugs in NAME_TO_CATEGORY_SLUGS.values())
+
+    def test_classification_keys_are_lowercase(self):
+        """Classification keys match the lowercased lookup form used by callers."""
+        assert all(key == key.lower() for key in CLASSIFICATION_TO_CATEGORY_SLUGS)
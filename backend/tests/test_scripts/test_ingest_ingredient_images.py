@@ -0,0 +1,180 @@
+"""
+Tests for the ingredient image ingestion script.
+
+This module tests scripts/ingest_ingredient_images.py backfilling of slugs,
+display names, image URLs, serving sizes and category links.
+"""
+
+import urllib.parse
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models import Category, IngredientEntity
+from scripts import ingest_ingredient_images
+from scripts.ingest_ingredient_images import build_image_url, ingest_ingredients, slugify
+
+
+BASE = "https://res.cloudinary.com/demo/image/upload"
+FOLDER = "healthlab/ingredients"
+SETTINGS = SimpleNamespace(cloudinary_cloud_name="demo")
+
+
+@pytest.fixture
+def seeded_db(db_session):
+    """Seed categories and a mix of new and already-backfilled ingredients."""
+    fruits = Category(name="Fruits", slug="fruits")
+    berries = Category(name="Berries", slug="berries")
+    db_session.add_all([fruits, berries])
+    db_session.flush()
+
+    done = IngredientEntity(
+        id="done",
+        name="Done Thing",
+        slug="done-thing",
+        display_name="Done Thing",
+        image_url="https://example.com/done.jpg",
+        primary_classification="ingredient",
+    )
+    done.categories.append(fruits)
+    db_session.add_all([
+        IngredientEntity(id="blueberries", name="Blueberries", primary_classification="ingredient"),
+        IngredientEntity(
+            id="mango",
+            name="Ripe Mango!",
+            primary_classification="ingredient",
+            classifications=["fruit"],
+            attributes={"calories": {"value": 60}},
+        ),
+        done,
+    ])
+    db_session.commit()
+    return db_session
+
+
+def run_ingest(db, slug_to_keywords=None, slug_to_serving=None):
+    """Run the ingestion with direct Cloudinary URLs and expire cached state."""
+    result = ingest_ingredients(
+        db,
+        BASE,
+        FOLDER,
+        SETTINGS,
+        slug_to_keywords or {},
+        slug_to_serving or {},
+        use_unsplash=False,
+        proxy_fetch=False,
+    )
+    db.commit()
+    db.expire_all()
+    return result
+
+
+class TestSlugify:
+    """Test slug generation."""
+
+    @pytest.mark.parametrize("name,expected", [
+        ("Blueberries", "blueberries"),
+        ("  Ripe Mango! ", "ripe-mango"),
+        ("Salt & Pepper -- Mix", "salt-pepper-mix"),
+        ("Crème Fraîche", "crme-frache"),
+    ])
+    def test_slugify(self, name, expected):
+        """Names are lowercased, stripped of punctuation and dash-joined."""
+        assert slugify(name) == expected
+
+
+class TestBuildImageUrl:
+    """Test image URL construction."""
+
+    @pytest.mark.parametrize("keywords", [None, "blueberries", "wild salmon", "crème,fraîche", "a&b?c"])
+    def test_proxy_fetch_url_is_percent_encoded(self, keywords):
+        """The proxied Unsplash URL matches urllib's full percent-encoding."""
+        url = build_image_url(BASE, FOLDER, "ripe-mango", SETTINGS, keywords, use_unsplash=True, proxy_fetch=True)
+
+        remote = f"https://source.unsplash.com/featured/?{(keywords or 'ripe-mango').replace('-', ',')}"
+        assert url == (
+            "https://res.cloudinary.com/demo/image/fetch/f_auto,q_auto,c_fill,w_640,h_360/"
+            + urllib.parse.quote(remote, safe="")
+        )
+
+
+class TestIngestIngredients:
+    """Test the bulk backfill of ingredient rows."""
+
+    def test_backfills_missing_fields(self, seeded_db):
+        """Missing slug, display name and image URL are filled in."""
+        updated, links = run_ingest(seeded_db)
+
+        mango = seeded_db.get(IngredientEntity, "mango")
+        assert updated == 2
+        assert mango.slug == "ripe-mango"
+        assert mango.display_name == "Ripe Mango!"
+        assert mango.image_url == f"{BASE}/f_auto,q_auto,c_fill,w_640,h_360/{FOLDER}/ripe-mango.jpg"
+        assert mango.attributes == {"calories": {"value": 60}}
+
+    def test_links_inferred_categories(self, seeded_db):
+        """Category links come from name rules and classification hints."""
+        _, links = run_ingest(seeded_db)
+
+        assert links == 3
+        blueberries = seeded_db.get(IngredientEntity, "blueberries")
+        mango = seeded_db.get(IngredientEntity, "mango")
+        assert {c.slug for c in blueberries.categories} == {"fruits", "berries"}
+        assert {c.slug for c in mango.categories} == {"fruits"}
+
+    def test_second_run_is_noop(self, seeded_db):
+        """Running again changes nothing once everything is backfilled."""
+        run_ingest(seeded_db)
+
+        assert run_ingest(seeded_db) == (0, 0)
+
+    def test_keyword_override_and_serving_size(self, seeded_db):
+        """Keyword overrides refresh image URLs and serving sizes are merged into attributes."""
+        serving = {"done-thing": {"serving_size_g": 150, "serving_size_g_source": "USDA"}}
+        updated, _ = run_ingest(seeded_db, {"done-thing": "done"}, serving)
+
+        done = seeded_db.get(IngredientEntity, "done")
+        assert updated == 3
+        assert done.image_url.endswith(f"{FOLDER}/done-thing.jpg")
+        assert done.attributes["serving_size_g"] == {"value": 150, "source": "USDA"}
+        assert done.attributes["serving_size_g_source"] == {"value": "USDA"}
+
+
+class TestMain:
+    """Test the command-line entry point."""
+
+    @pytest.fixture
+    def run_main(self, seeded_db, monkeypatch):
+        """Run main() against the test database with the given arguments."""
+        bind = seeded_db.get_bind()
+        monkeypatch.setattr("app.database.engine", bind)
+        monkeypatch.setattr("app.database.SessionLocal", lambda: Session(bind=bind, autoflush=False))
+        monkeypatch.setattr("app.config.get_settings", lambda: SimpleNamespace(
+            cloudinary_base_url=BASE,
+            cloudinary_cloud_name="demo",
+            cloudinary_proxy_fetch=False,
+        ))
+        monkeypatch.setenv("CLOUDINARY_INGREDIENT_USE_UNSPLASH", "false")
+
+        def run(*argv):
+            monkeypatch.setattr("sys.argv", ["ingest_ingredient_images.py", *argv])
+            ingest_ingredient_images.main()
+            seeded_db.expire_all()
+            return seeded_db.get(IngredientEntity, "mango")
+
+        return run
+
+    def test_dry_run_rolls_back(self, run_main, capsys):
+        """--dry-run reports the changes without persisting them."""
+        mango = run_main("--dry-run")
+
+        assert "[DRY RUN] Would update 2 ingredients and create 3 category links" in capsys.readouterr().out
+        assert mango.slug is None
+
+    def test_commits_changes(self, run_main, capsys):
+        """A normal run persists the backfill in one transaction."""
+        mango = run_main()
+
+        assert "Updated 2 ingredients" in capsys.readouterr().out
+        assert mango.slug == "ripe-mango"
@@ -0,0 +1,383 @@
+"""
+Tests for the LLM meal plan service.
+
+This module tests the provider-independent parts of meal plan generation
+without calling any external LLM API.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from app.models.user import User
+from app.schemas.meal_plan import DailyMealPlan
+from app.services import llm_service
+
+
+SURVEY_DATA = {
+    "healthPillars": ["Heart Health"],
+    "dietaryRestrictions": ["vegetarian"],
+    "mealComplexity": "moderate",
+    "dislikedIngredients": [],
+    "mealsPerDay": "3",
+    "allergies": ["peanuts"],
+    "primaryGoal": "Eat better",
+}
+
+
+def make_user(survey_data=None):
+    """Build an unsaved user with survey data in preferences."""
+    return User(
+        id=1,
+        email="llm@example.com",
+        username="llmuser",
+        hashed_password="fake_hash",
+        preferences={"survey_data": survey_data or SURVEY_DATA},
+    )
+
+
+def make_plan():
+    """Build a minimal validated one-day plan."""
+    return [DailyMealPlan.model_validate({
+        "day": "Day 1",
+        "meals": [{"type": "breakfast", "name": "Oats", "calories": 300}],
+    })]
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Ensure every test starts with an empty response cache."""
+    llm_service._RESPONSE_CACHE.clear()
+    llm_service._INFLIGHT.clear()
+    yield
+    llm_service._RESPONSE_CACHE.clear()
+    llm_service._INFLIGHT.clear()
+
+
+@pytest.fixture
+def fake_anthropic(monkeypatch):
+    """Replace the Anthropic provider call with a counting stub."""
+    calls = []
+
+    async def fake_generate(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0)
+        return make_plan()
+
+    monkeypatch.setattr(llm_service, "generate_llm_meal_plan_anthropic", fake_generate)
+    return calls
+
+
+class TestPromptBuilding:
+    """Test meal plan prompt generation."""
+
+    def test_prompt_contains_survey_fields(self):
+        """The prompt carries all user-specific constraints."""
+        prompt = llm_service.generate_meal_plan_prompt(SURVEY_DATA, 3, False, ["Kale", "Oats"])
+
+        assert "3-day meal plan" in prompt
+        assert "(ONLY: Heart Health)" in prompt
+        assert '"Heart Health"' in prompt
+        assert "peanuts" in prompt
+        assert "NO meat, poultry, fish, or seafood" in prompt
+        assert "Kale, Oats" in prompt
+
+    @pytest.mark.parametrize("meals_per_day,structure", [
+        ("3", "3 meals (breakfast, lunch, dinner)"),
+        ("6", "6 small meals throughout the day"),
+        ("bogus", "3 main meals + 2 snacks"),
+    ])
+    def test_meal_structure_in_mandate_and_requirements(self, meals_per_day, structure):
+        """The meal structure appears in both the mandate and the requirements list."""
+        prompt = llm_service.generate_meal_plan_prompt({**SURVEY_DATA, "mealsPerDay": meals_per_day}, 1, False)
+
+        assert f"Each day MUST have exactly this structure: {structure}\n" in prompt
+        assert f"5. Each day must follow the meal structure: {structure}\n" in prompt
+    def test_prompt_without_example(self):
+        """Schema-enforcing providers get the prompt without the example JSON."""
+        prompt = llm_service.generate_meal_plan_prompt(SURVEY_DATA, 1, True, include_example=False)
+
+        assert "JSON-ONLY MANDATE" not in prompt
+        assert '"Meal Name"' not in prompt
+        assert prompt.endswith("Generate the 1-day meal plan now as pure JSON:")
+
+
+class TestMaxTokens:
+    """Test the output token budget estimate."""
+
+    def test_budget_grows_with_plan_size(self):
+        """More days, more meals and recipes all raise the budget."""
+        small = llm_service._estimate_max_tokens(1, False, "3")
+        assert llm_service._estimate_max_tokens(2, False, "3") > small
+        assert llm_service._estimate_max_tokens(1, False, "6") > small
+        assert llm_service._estimate_max_tokens(1, True, "3") > small
+
+    def test_unknown_meal_structure_uses_default(self):
+        """Unrecognized mealsPerDay values budget for 3 meals + 2 snacks."""
+        assert (
+            llm_service._estimate_max_tokens(1, False, "bogus")
+            == llm_service._estimate_max_tokens(1, False, "3-meals-2-snacks")
+        )
+
+    def test_budget_is_capped(self):
+        """Large plans never exceed the provider output limit."""
+        assert llm_service._estimate_max_tokens(14, True, "6") == llm_service._MAX_OUTPUT_TOKENS
+
+
+class FakeStream:
+    """Async context manager mimicking the Anthropic message stream."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    async def text_stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def chunked(text, size):
+    """Split text into fixed-size chunks."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestAnthropicStreaming:
+    """Test the streamed Anthropic provider path."""
+
+    def test_streamed_days_are_validated(self, monkeypatch):
+        """Days arriving over the stream are validated into DailyMealPlan objects."""
+        data = [
+            {"day": "Day 1", "meals": [{"type": "lunch", "name": "Soup", "calories": 350}]},
+            {"day": "Day 2", "meals": [{"type": "dinner", "name": "Stew", "calories": 500}]},
+        ]
+        monkeypatch.setattr(
+            llm_service._get_anthropic_client().messages, "stream",
+            lambda **kwargs: FakeStream(chunked(json.dumps(data), 5))
+        )
+
+        plans = asyncio.run(llm_service.generate_llm_meal_plan_anthropic(
+            SURVEY_DATA, 2, False, None, user_id=1
+        ))
+
+        assert [plan.day for plan in plans] == ["Day 1", "Day 2"]
+        assert plans[1].meals[0].name == "Stew"
+
+    def test_truncated_stream_raises(self, monkeypatch):
+        """A response cut off mid-array is reported as invalid JSON."""
+        monkeypatch.setattr(
+            llm_service._get_anthropic_client().messages, "stream",
+            lambda **kwargs: FakeStream(['[{"day": "Day 1", "meals": []}, {"day"'])
+        )
+
+        with pytest.raises(llm_service.LLMResponseError):
+            asyncio.run(llm_service.generate_llm_meal_plan_anthropic(
+                SURVEY_DATA, 1, False, None, user_id=1
+            ))
+
+    def test_malformed_day_raises_invalid_json(self, monkeypatch):
+        """A syntax error inside a day is reported as invalid JSON, not a schema mismatch."""
+        monkeypatch.setattr(
+            llm_service._get_anthropic_client().messages, "stream",
+            lambda **kwargs: FakeStream(['[{"day": "Day 1", "meals": [],}]'])
+        )
+
+        with pytest.raises(llm_service.LLMResponseError, match="invalid JSON"):
+            asyncio.run(llm_service.generate_llm_meal_plan(make_user(), provider="anthropic"))
+
+
+def fake_openai_client(content, calls=None):
+    """Build a stand-in OpenAI client whose completion returns content."""
+    async def create(**kwargs):
+        if calls is not None:
+            calls.append(kwargs)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+class TestOpenAIParsing:
+    """Test parsing of OpenAI JSON-mode responses."""
+
+    @pytest.mark.parametrize("payload", [
+        [{"day": "Day 1", "meals": []}],
+        {"plan": [{"day": "Day 1", "meals": []}]},
+        {"day": "Day 1", "meals": []},
+    ])
+    def test_accepts_wrapped_and_bare_plans(self, monkeypatch, payload):
+        """Bare arrays, root-wrapped arrays and single day objects are all accepted."""
+        monkeypatch.setattr(llm_service, "_get_openai_client", lambda: fake_openai_client(json.dumps(payload)))
+
+        plans = asyncio.run(llm_service.generate_llm_meal_plan_openai(
+            SURVEY_DATA, 1, False, None, user_id=1
+        ))
+
+        assert [plan.day for plan in plans] == ["Day 1"]
+
+    @pytest.mark.parametrize("num_days,include_recipes,offloaded", [
+        (1, False, False),
+        (3, False, True),
+        (1, True, True),
+    ])
+    def test_large_plans_validate_in_thread(self, monkeypatch, num_days, include_recipes, offloaded):
+        """Multi-day and recipe plans are validated off the event loop."""
+        threaded = []
+        to_thread = asyncio.to_thread
+
+        async def recording_to_thread(func, *args, **kwargs):
+            threaded.append(func)
+            return await to_thread(func, *args, **kwargs)
+
+        payload = [{"day": f"Day {i + 1}", "meals": []} for i in range(num_days)]
+        monkeypatch.setattr(llm_service, "_get_openai_client", lambda: fake_openai_client(json.dumps(payload)))
+        monkeypatch.setattr(llm_service.asyncio, "to_thread", recording_to_thread)
+
+        plans = asyncio.run(llm_service.generate_llm_meal_plan_openai(
+            SURVEY_DATA, num_days, include_recipes, None, user_id=1
+        ))
+
+        assert len(plans) == num_days
+        assert bool(threaded) is offloaded
+
+    @pytest.mark.parametrize("include_recipes", [True, False])
+    def test_requests_strict_schema(self, monkeypatch, include_recipes):
+        """The completion is constrained to a closed schema matching the recipe flag."""
+        calls = []
+        payload = {"plan": [{"day": "Day 1", "meals": []}]}
+        monkeypatch.setattr(llm_service, "_get_openai_client", lambda: fake_openai_client(json.dumps(payload), calls))
+
+        asyncio.run(llm_service.generate_llm_meal_plan_openai(
+            SURVEY_DATA, 1, include_recipes, None, user_id=1
+        ))
+
+        response_format = calls[0]["response_format"]
+        schema = response_format["json_schema"]["schema"]
+        meal = schema["properties"]["plan"]["items"]["properties"]["meals"]["items"]
+        assert response_format["json_schema"]["strict"] is True
+        assert set(meal["required"]) == set(meal["properties"])
+        assert meal["additionalProperties"] is False
+        assert ("instructions" in meal["properties"]) is include_recipes
+
+    @pytest.mark.parametrize("model", ["gpt-4", "gpt-4-turbo", "gpt-3.5-turbo", "gpt-4o-2024-05-13"])
+    def test_older_models_use_json_mode(self, monkeypatch, model):
+        """Models without Structured Outputs get JSON mode and the example JSON in the prompt."""
+        calls = []
+        payload = {"plan": [{"day": "Day 1", "meals": []}]}
+        monkeypatch.setattr(llm_service, "_get_openai_client", lambda: fake_openai_client(json.dumps(payload), calls))
+
+        plans = asyncio.run(llm_service.generate_llm_meal_plan_openai(
+            SURVEY_DATA, 1, False, None, user_id=1, model=model
+        ))
+
+        assert len(plans) == 1
+        assert calls[0]["response_format"] == {"type": "json_object"}
+        assert "JSON-ONLY MANDATE" in calls[0]["messages"][1]["content"]
+
+    def test_invalid_json_raises(self, monkeypatch):
+        """Unparseable output is reported as an LLMResponseError."""
+        monkeypatch.setattr(llm_service, "_get_openai_client", lambda: fake_openai_client("not json"))
+
+        with pytest.raises(llm_service.LLMResponseError):
+            asyncio.run(llm_service.generate_llm_meal_plan_openai(
+                SURVEY_DATA, 1, False, None, user_id=1
+            ))
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    """Enable the opt-in response cache."""
+    monkeypatch.setattr(llm_service.settings, "llm_response_cache_size", 512)
+
+
+class TestResponseCache:
+    """Test caching of generated meal plans."""
+
+    def test_sequential_requests_regenerate_by_default(self, fake_anthropic, monkeypatch):
+        """With the cache disabled, asking again for the same inputs calls the provider again."""
+        monkeypatch.setattr(llm_service.settings, "llm_response_cache_size", 0)
+        user = make_user()
+
+        asyncio.run(llm_service.generate_llm_meal_plan(user, provider="anthropic"))
+        asyncio.run(llm_service.generate_llm_meal_plan(user, provider="anthropic"))
+
+        assert len(fake_anthropic) == 2
+        assert not llm_service._RESPONSE_CACHE
+
+    def test_identical_requests_hit_cache(self, fake_anthropic, response_cache):
+        """A repeated request is served without calling the provider again."""
+        user = make_user()
+
+        first = asyncio.run(llm_service.generate_llm_meal_plan(user, provider="anthropic"))
+        second = asyncio.run(llm_service.generate_llm_meal_plan(user, provider="anthropic"))
+
+        assert len(fake_anthropic) == 1
+        assert first == second
+        assert first[0] is not second[0]
+
+    def test_different_inputs_miss_cache(self, fake_anthropic, response_cache):
+        """Changing any generation input results in a new provider call."""
+        user = make_user()
+
+        asyncio.run(llm_service.generate_llm_meal_plan(user, provider="anthropic"))
+        asyncio.run(llm_service.generate_llm_meal_plan(user, num_days=2, provider="anthropic"))
+        asyncio.run(llm_service.generate_llm_meal_plan(user, include_recipes=True, provider="anthropic"))
+
+        assert len(fake_anthropic) == 3
+
+    @pytest.mark.parametrize("cache_size", [0, 512])
+    def test_concurrent_identical_requests_share_call(self, fake_anthropic, monkeypatch, cache_size):
+        """Concurrent identical requests wait on a single in-flight generation."""
+        monkeypatch.setattr(llm_service.settings, "llm_response_cache_size", cache_size)
+        user = make_user()
+
+        async def run_concurrently():
+            return await asyncio.gather(*(
+                llm_service.generate_llm_meal_plan(user, provider="anthropic")
+                for _ in range(3)
+            ))
+
+        results = asyncio.run(run_concurrently())
+
+        assert len(fake_anthropic) == 1
+        assert all(result == results[0] for result in results)
+        assert not llm_service._INFLIGHT
+
+    def test_failures_are_not_cached(self, monkeypatch, response_cache):
+        """A failed generation is retried on the next request."""
+        calls = []
+
+        async def failing_generate(**kwargs):
+            calls.append(kwargs)
+            raise llm_service.LLMResponseError("boom")
+
+        monkeypatch.setattr(llm_service, "generate_llm_meal_plan_anthropic", failing_generate)
+        user = make_user()
+
+        for _ in range(2):
+            with pytest.raises(llm_service.LLMResponseError):
+                asyncio.run(llm_service.generate_llm_meal_plan(user, provider="anthropic"))
+
+        assert len(calls) == 2
+        assert not llm_service._RESPONSE_CACHE
+
+    def test_cache_evicts_oldest_entry(self, fake_anthropic, monkeypatch):
+        """The cache never grows beyond the configured size."""
+        monkeypatch.setattr(llm_service.settings, "llm_response_cache_size", 2)
+
+        for goal in ("a", "b", "c"):
+            user = make_user({**SURVEY_DATA, "primaryGoal": goal})
+            asyncio.run(llm_service.generate_llm_meal_plan(user, provider="anthropic"))
+
+        assert len(llm_service._RESPONSE_CACHE) == 2
+
+        asyncio.run(llm_service.generate_llm_meal_plan(
+            make_user({**SURVEY_DATA, "primaryGoal": "a"}), provider="anthropic"
+        ))
+        assert len(fake_anthropic) == 4